@@ -1,26 +1,200 @@
-import json
+import codecs
+import io
+import logging
 import re
+import secrets
 import time
+from collections import deque
+from contextvars import ContextVar
 from dataclasses import dataclass, field
-from random import randrange
-from typing import Optional, List, Any, Dict
+from random import getrandbits
+from typing import Optional, List, Any, Dict, Tuple, Union
 from enum import Enum
-from uuid import uuid4
+from functools import lru_cache
+from math import comb, isnan
+from operator import attrgetter, methodcaller
 
-import bs4
-from bs4 import BeautifulSoup
+from lxml import etree
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    import json
+    orjson = None
+
+
+if orjson is not None:
+    _dumps_bytes = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
 
 PREFER_DASHED_TO_DOTTED = True
 IGNORE_UNDEFINED_REQUIREMENTS = True
 IGNORE_NOT_SPECIFIED_TYPE = True
 IGNORE_NONE_DOC_REF = True
+# Number of straight segments used to approximate each curve in a path
+BEZIER_SEGMENTS = 10
+
+# Placeholder lines mermaid fills requirement diagrams with, dropped according to the IGNORE_* flags above
+_UNDEFINED_REQUIREMENT_TEXTS = frozenset({
+    "Id: undefined",
+    "Text: undefined",
+    "Risk: undefined",
+    "Verification: undefined",
+})
+_NOT_SPECIFIED_TYPE_TEXTS = frozenset({"Type: Not Specified"})
+_NONE_DOC_REF_TEXTS = frozenset({"Doc Ref: None"})
+
+
+def _ignored_tspan_texts() -> frozenset:
+    # The flags are read on each call so that they can still be changed after import
+    ignored = frozenset()
+    if IGNORE_UNDEFINED_REQUIREMENTS:
+        ignored |= _UNDEFINED_REQUIREMENT_TEXTS
+    if IGNORE_NOT_SPECIFIED_TYPE:
+        ignored |= _NOT_SPECIFIED_TYPE_TEXTS
+    if IGNORE_NONE_DOC_REF:
+        ignored |= _NONE_DOC_REF_TEXTS
+    return ignored
+
+
+# Subtrees none of the converters read. Markers are normally inside <defs>, but a stray one would otherwise have its
+#  arrowhead path picked up by from_svg_node; <title> and <desc> carry mermaid's accessibility text
+_DISCARDED_SVG_TAGS = ("style", "defs", "marker", "title", "desc")
+
+# The encoding named in a leading <?xml ...?> declaration
+_XML_ENCODING_RE = re.compile(rb"""\s*<\?xml[^>]*?\bencoding\s*=\s*["']([A-Za-z][\w.:-]*)["']""")
+
+# Byte-order marks that libxml2 detects on its own
+_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+def _xpath_has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+_XP_SVG = etree.XPath(".//svg")
+_XP_G = etree.XPath(".//g")
+_XP_SPAN = etree.XPath(".//span")
+_XP_PATH = etree.XPath(".//path")
+_XP_RECT = etree.XPath(".//rect")
+_XP_ACTOR_RECT = etree.XPath(f".//rect[{_xpath_has_class('actor')}]")
+
+# Classes of the <g> containers Element.from_svg_tree converts
+_TREE_GROUP_CLASSES = frozenset({"edgePaths", "edgeLabels", "nodes", "clusters"})
+
+# Tags converted by Element.from_svg_node
+_NODE_SHAPE_TAGS = ("foreignobject", "line", "rect", "text", "polygon", "circle", "path")
+
+
+def _find(xpath: etree.XPath, element: etree._Element) -> Optional[etree._Element]:
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _text(element: etree._Element) -> str:
+    return "".join(element.itertext())
+
+
+def _has_class(element: etree._Element, class_name: str) -> bool:
+    return class_name in (element.get("class") or "").split()
+
+
+def _remove_keeping_tail(element: etree._Element):
+    # lxml removes an element's tail along with it, but the tail is text of the parent (e.g. the rest of a <text>
+    #  after a <title>), so it is moved onto whatever precedes the element first
+    parent = element.getparent()
+    if parent is None:
+        # Already gone with a discarded ancestor
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def _bucket_children(
+        element: etree._Element, tags: Tuple[str, ...] = (), classes: Tuple[str, ...] = (),
+) -> Tuple[Dict[str, List[etree._Element]], Dict[str, List[etree._Element]]]:
+    # Sort an element's children into lists in one pass: by tag for the given tags and, for a <g>, by each of its
+    #  classes for the given classes. The two are kept apart so that a class named like a tag can't share its list
+    by_tag = {tag: [] for tag in tags}
+    by_class = {class_name: [] for class_name in classes}
+    for child in element.iterchildren(tag=etree.Element):
+        tag = child.tag
+        if tag in by_tag:
+            by_tag[tag].append(child)
+        if tag == "g" and by_class:
+            for class_name in set((child.get("class") or "").split()):
+                if class_name in by_class:
+                    by_class[class_name].append(child)
+    return by_tag, by_class
+
+
+def _find_tree_groups(tree: etree._Element) -> Dict[str, etree._Element]:
+    # The first <g> below the tree with each of the container classes, found in one walk over the tree instead of
+    #  one search per class
+    groups = {}
+    for g in tree.iterdescendants("g"):
+        for class_name in (g.get("class") or "").split():
+            if class_name in _TREE_GROUP_CLASSES:
+                groups.setdefault(class_name, g)
+        if len(groups) == len(_TREE_GROUP_CLASSES):
+            break
+    return groups
+
+
+# Ids are cut from one secrets.token_hex() call per batch rather than paying for a UUID (and its urandom call) per
+#  element
+_ID_BATCH_SIZE = 64
+_id_pool: List[str] = []
 
 
 def random_id() -> str:
-    return uuid4().hex[:16]
+    if not _id_pool:
+        batch = secrets.token_hex(8 * _ID_BATCH_SIZE)
+        _id_pool.extend(batch[i:i + 16] for i in range(0, len(batch), 16))
+    return _id_pool.pop()
+
+
+def random_seed() -> int:
+    return getrandbits(31)
+
 
+# Set for the duration of a bulk conversion so that every element it creates shares one timestamp
+_bulk_now_ms: ContextVar[Optional[int]] = ContextVar("_bulk_now_ms", default=None)
 
-@dataclass
+
+def now_ms() -> int:
+    return _bulk_now_ms.get() or int(time.time() * 1000)
+
+
+class _EnumByValue(dict):
+    # Value -> member map for decoding enums without going through Enum.__call__. Unknown values still go to the
+    #  enum itself, so they raise the same ValueError as before
+    def __init__(self, enum_cls):
+        super().__init__((member.value, member) for member in enum_cls)
+        self.enum_cls = enum_cls
+
+    def __missing__(self, value):
+        return self.enum_cls(value)
+
+
+@dataclass(slots=True)
 class Excalidraw:
     elements: List['Element'] = field(default_factory=list)
     app_state: 'AppState' = field(default_factory=lambda: AppState())
@@ -39,6 +213,16 @@ class Excalidraw:
             "files": {k: v.to_json() for k, v in self.files.items()},
         }
 
+    def dumps(self) -> str:
+        return _dumps_bytes(self.to_json()).decode()
+
+    def dumps_bytes(self) -> bytes:
+        return _dumps_bytes(self.to_json())
+
+    @classmethod
+    def loads(cls, data: Union[str, bytes]):
+        return cls.from_json(_loads(data))
+
     @classmethod
     def from_json(cls, json: Dict[str, Any]):
         return cls(
@@ -51,17 +235,58 @@ class Excalidraw:
         )
 
     @classmethod
-    def from_svg(cls, svg: str):
-        tree = BeautifulSoup(svg, "html.parser")
+    def from_svg(cls, svg: Union[str, bytes]):
+        # Raw bytes (e.g. a response body) go to the parser as-is. A byte-order mark is left for libxml2 to detect,
+        #  since an explicit encoding would override it. libxml2's HTML mode ignores the XML declaration, so the
+        #  encoding it declares is read here; SVG with neither is UTF-8
+        if isinstance(svg, bytes):
+            data = svg
+            if svg.startswith(_BOMS):
+                encoding = None
+            else:
+                declaration = _XML_ENCODING_RE.match(svg)
+                encoding = declaration.group(1).decode("ascii") if declaration else "utf-8"
+                try:
+                    # libxml2 doesn't know every name Python's codecs do, so it is asked directly
+                    etree.HTMLParser(encoding=encoding)
+                except LookupError:
+                    logger.warning("Unknown SVG encoding %r, parsing as UTF-8", encoding)
+                    encoding = "utf-8"
+        else:
+            data = svg.encode()
+            encoding = "utf-8"
+        # Stream the parse so that subtrees none of the converters read (the stylesheet, marker and gradient
+        #  definitions, accessibility text) are dropped as soon as they are closed instead of being kept around in
+        #  the tree. Their tails are left alone until the parse is done, as the parser may still be appending to them
+        context = etree.iterparse(
+            io.BytesIO(data), events=("end",), tag=_DISCARDED_SVG_TAGS, html=True, encoding=encoding,
+        )
+        discarded = []
+        try:
+            for _, element in context:
+                element.clear(keep_tail=True)
+                discarded.append(element)
+        except etree.XMLSyntaxError:
+            # Raised for empty documents
+            return cls()
+        tree = context.root
+        if tree is None:
+            return cls()
+        for element in discarded:
+            _remove_keeping_tail(element)
 
         return cls.from_svg_tree(tree)
 
     @classmethod
-    def from_svg_tree(cls, tree: BeautifulSoup):
-        return cls(elements=Element.from_svg_tree(tree))
+    def from_svg_tree(cls, tree: etree._Element):
+        token = _bulk_now_ms.set(int(time.time() * 1000))
+        try:
+            return cls(elements=Element.from_svg_tree(tree))
+        finally:
+            _bulk_now_ms.reset(token)
 
 
-@dataclass
+@dataclass(slots=True)
 class AppState:
     view_background_color: str = '#ffffff'
     grid_size: Optional[int] = None
@@ -91,7 +316,10 @@ class TypeEnum(Enum):
     TEXT = "text"
 
 
-@dataclass
+_TYPE_BY_VALUE = _EnumByValue(TypeEnum)
+
+
+@dataclass(slots=True)
 class BoundElement:
     id: str
     type: TypeEnum
@@ -99,17 +327,24 @@ class BoundElement:
     def to_json(self):
         return {
             "id": self.id,
-            "type": self.type.value,
+            "type": self.type._value_,
         }
 
     @classmethod
-    def from_json(cls, be):
+    def from_json(cls, be: Dict[str, Any]):
         return cls(
             id=be["id"],
-            type=TypeEnum(be["type"]),
+            type=_TYPE_BY_VALUE[be["type"]],
         )
 
 
+def _bind(container: "Element", elements: List["Element"]) -> None:
+    # Put each of the elements inside container and list them as its bound elements
+    for element in elements:
+        element.container_id = container.id
+    container.bound_elements = [BoundElement(element.id, element.type) for element in elements]
+
+
 class Arrowhead(Enum):
     DOT = "dot"
     ARROW = "arrow"
@@ -117,7 +352,10 @@ class Arrowhead(Enum):
     TRIANGLE = "triangle"
 
 
-@dataclass
+_ARROWHEAD_BY_VALUE = _EnumByValue(Arrowhead)
+
+
+@dataclass(slots=True)
 class Binding:
     element_id: str
     focus: float
@@ -145,63 +383,176 @@ class Style(Enum):
     SOLID = "solid"
 
 
+_STYLE_BY_VALUE = _EnumByValue(Style)
+
+
 class StrokeStyle(Enum):
     SOLID = "solid"
     DASHED = "dashed"
     DOTTED = "dotted"
 
 
+_STROKE_STYLE_BY_VALUE = _EnumByValue(StrokeStyle)
+
+
 class StrokeSharpness(Enum):
     ROUND = "round"
     SHARP = "sharp"
 
 
+_STROKE_SHARPNESS_BY_VALUE = _EnumByValue(StrokeSharpness)
+
+
 class TextAlign(Enum):
     CENTER = "center"
     LEFT = "left"
     RIGHT = "right"
 
 
+_TEXT_ALIGN_BY_VALUE = _EnumByValue(TextAlign)
+
+
 class VerticalAlign(Enum):
     BOTTOM = "bottom"
     MIDDLE = "middle"
     TOP = "top"
 
 
-def parse_style(style: Optional[str]) -> dict:
+_VERTICAL_ALIGN_BY_VALUE = _EnumByValue(VerticalAlign)
+
+# Alignment for the SVG text-anchor and dominant-baseline values Excalidraw has an equivalent for
+_TEXT_ANCHOR_ALIGN = {"middle": TextAlign.CENTER, "end": TextAlign.RIGHT}
+_DOMINANT_BASELINE_ALIGN = {
+    "middle": VerticalAlign.MIDDLE,
+    "hanging": VerticalAlign.TOP,
+    "text-after-edge": VerticalAlign.BOTTOM,
+}
+
+
+def parse_style(style: Optional[str]) -> Dict[str, Any]:
+    # Each caller gets its own copy, so that changing it can't leak into the cache
+    return dict(_parse_style(style))
+
+
+# Mermaid repeats the same handful of inline styles on every edge and node, so parsed styles are cached
+@lru_cache(maxsize=256)
+def _parse_style(style: Optional[str]) -> Dict[str, Any]:
     if not style:
         return {}
-    style = str(style)
     out = {}
-    for kv in style.split(";"):
-        if ":" not in kv:
+    # Keys and values are both lowercased, so do it once for the whole declaration list
+    for kv in str(style).lower().split(";"):
+        k, sep, v = kv.partition(":")
+        if not sep:
             continue
-        k, v = kv.split(":", 1)
-        k = k.strip().lower()
-        v = v.strip().lower()
+        v = v.strip()
         try:
             v = float(v)
         except ValueError:
             pass
-        out[k] = v
+        out[k.strip()] = v
     return out
 
 
-def parse_transform(transform: Optional[str]) -> (float, float):
+# SVG allows the translate arguments to be separated by whitespace as well as a comma, and ty may be omitted
+_TRANSLATE_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_TRANSLATE_RE = re.compile(rf"translate\(\s*({_TRANSLATE_NUMBER})(?:\s*,?\s*({_TRANSLATE_NUMBER}))?")
+
+
+def parse_transform(transform: Optional[str]) -> Tuple[float, float]:
     if not transform:
         return 0.0, 0.0
     transform = str(transform)
-    m = re.match(r"translate\(([-\d\.]+),\s*([-\d\.]+)\s*\)", transform)
+    m = _TRANSLATE_RE.search(transform)
     if not m:
         return 0.0, 0.0
-    return float(m.group(1)), float(m.group(2))
+    tx, ty = m.groups()
+    return float(tx), float(ty) if ty else 0.0
+
+
+# Number of arguments taken by each supported path command
+_PATH_COMMAND_ARITY = {"M": 2, "L": 2, "l": 2, "C": 6, "A": 7, "a": 7, "Z": 0, "z": 0}
+
+_PATH_TOKEN_RE = re.compile(r"(NaN|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|([MmLlHhVvCcSsQqTtAaZz])")
+
+
+def parse_path(d: str) -> List[Tuple[str, List[float]]]:
+    # Split path data into (command, arguments) pairs, one per segment. Extra sets of arguments after a command
+    #  are implicit repeats of that command, so they get a pair of their own.
+    commands = []
+    for number, letter in _PATH_TOKEN_RE.findall(d):
+        if letter:
+            commands.append((letter, []))
+        elif commands:
+            commands[-1][1].append(float(number))
+
+    segments = []
+    for letter, args in commands:
+        arity = _PATH_COMMAND_ARITY.get(letter)
+        if not arity or len(args) <= arity:
+            segments.append((letter, args))
+            continue
+        for i in range(0, len(args), arity):
+            segments.append((letter, args[i:i + arity]))
+    return segments
+
+
+@lru_cache(maxsize=None)
+def _bezier_t(segments: int) -> Tuple[float, ...]:
+    # Sample positions along a curve, t = 0, 1 / segments, ..., 1
+    return tuple(i / segments for i in range(segments + 1))
+
+
+@lru_cache(maxsize=None)
+def _bernstein_basis(degree: int, segments: int) -> "np.ndarray":
+    t = np.array(_bezier_t(segments))[:, np.newaxis]
+    k = np.arange(degree + 1)
+    coefficients = np.array([comb(degree, i) for i in k], dtype=float)
+    return coefficients * t ** k * (1 - t) ** (degree - k)
+
+
+def _de_casteljau(def_points: List[List[float]], t: float) -> List[float]:
+    points = [list(point) for point in def_points]
+    for r in range(1, len(points)):
+        for i in range(len(points) - r):
+            points[i][0] = points[i][0] * (1 - t) + points[i + 1][0] * t
+            points[i][1] = points[i][1] * (1 - t) + points[i + 1][1] * t
+    return points[0]
+
+
+def bezier_curve(def_points: List[List[float]], segments: Optional[int] = None) -> List[List[float]]:
+    if segments is None:
+        segments = BEZIER_SEGMENTS
+    if np is None:
+        samples = (_de_casteljau(def_points, t) for t in _bezier_t(segments))
+        return [[round(x, 5), round(y, 5)] for x, y in samples]
+    control_points = np.asarray(def_points, dtype=float)
+    curve = _bernstein_basis(len(control_points) - 1, segments) @ control_points
+    return np.round(curve, 5).tolist()
+
+
+# Average character advance of each Excalidraw font family (1: Virgil, 2: Helvetica, 3: Cascadia) as a fraction of
+#  the font size, for estimating how wide a converted label is
+_FONT_ADVANCE = {1: 0.55, 2: 0.55, 3: 0.6}
+
+
+def estimate_text_width(text: str, font_size: float, font_family: int = 2) -> float:
+    return len(text) * font_size * _FONT_ADVANCE.get(font_family, 0.55)
 
 
-def size_attr_to_float(attr: str, font_size=16) -> float:
+# Text positions and offsets are drawn from a small set of values ("0", "1em", "-9.5", ...), so results are cached
+@lru_cache(maxsize=4096)
+def size_attr_to_float(attr: Optional[str], font_size: float = 16) -> float:
     if not attr:
         return 0.0
+    # Most sizes are bare numbers, so only look for units once that fails
+    try:
+        return float(attr)
+    except ValueError:
+        pass
     attr = str(attr)
-    attr = attr.replace("px", "")
+    if "px" in attr:
+        attr = attr.replace("px", "")
     multiplier = 1.0
     if "em" in attr:
         multiplier = font_size
@@ -209,11 +560,43 @@ def size_attr_to_float(attr: str, font_size=16) -> float:
     try:
         return float(attr) * multiplier
     except ValueError as e:
-        print(f"Failed to parse {attr} as float: {e}")
+        logger.warning("Failed to parse %s as float: %s", attr, e)
         return 0.0
 
 
-@dataclass
+_to_json = methodcaller("to_json")
+# Enum.value is a descriptor that is several times slower to read than the plain _value_ attribute it wraps
+_enum_value = attrgetter("_value_")
+
+# (attribute, JSON key, encoder, decoder) for the Element fields that are only serialized when set
+_ELEMENT_OPTIONAL_FIELDS = (
+    ("bound_elements", "boundElements",
+     lambda bound_elements: [be.to_json() for be in bound_elements],
+     lambda bound_elements: [BoundElement.from_json(be) for be in bound_elements]),
+    ("link", "link", None, None),
+    ("points", "points", None, None),
+    ("last_committed_point", "lastCommittedPoint", None, None),
+    ("start_binding", "startBinding", _to_json, Binding.from_json),
+    ("end_binding", "endBinding", _to_json, Binding.from_json),
+    ("start_arrowhead", "startArrowhead", _enum_value, _ARROWHEAD_BY_VALUE.__getitem__),
+    ("end_arrowhead", "endArrowhead", _enum_value, _ARROWHEAD_BY_VALUE.__getitem__),
+    ("text", "text", None, None),
+    ("font_size", "fontSize", None, None),
+    ("font_family", "fontFamily", None, None),
+    ("text_align", "textAlign", _enum_value, _TEXT_ALIGN_BY_VALUE.__getitem__),
+    ("vertical_align", "verticalAlign", _enum_value, _VERTICAL_ALIGN_BY_VALUE.__getitem__),
+    ("baseline", "baseline", None, None),
+    ("container_id", "containerId", None, None),
+    ("original_text", "originalText", None, None),
+    ("pressures", "pressures", None, None),
+    ("simulate_pressure", "simulatePressure", None, None),
+    ("status", "status", None, None),
+    ("file_id", "fileId", None, None),
+    ("scale", "scale", None, None),
+)
+
+
+@dataclass(slots=True)
 class Element:
     type: TypeEnum
     x: float = 0.0
@@ -227,11 +610,11 @@ class Element:
     roughness: int = 0
     opacity: int = 100
     stroke_sharpness: StrokeSharpness = StrokeSharpness.SHARP
-    seed: int = field(default_factory=lambda: randrange(0, 2 ** 31))
+    seed: int = field(default_factory=random_seed)
     version: int = 1
-    version_nonce: int = field(default_factory=lambda: randrange(0, 2 ** 31))
+    version_nonce: int = field(default_factory=random_seed)
     is_deleted: bool = False
-    updated: int = field(default_factory=lambda: int(time.time() * 1000))
+    updated: int = field(default_factory=now_ms)
     angle: int = 0
     background_color: str = "transparent"
     stroke_color: str = "#000000"
@@ -261,19 +644,19 @@ class Element:
     def to_json(self):
         obj = {
             "id": self.id,
-            "type": self.type.value,
+            "type": self.type._value_,
             "x": self.x,
             "y": self.y,
             "width": self.width,
             "height": self.height,
             "angle": self.angle,
-            "fillStyle": self.fill_style.value,
+            "fillStyle": self.fill_style._value_,
             "strokeWidth": self.stroke_width,
-            "strokeStyle": self.stroke_style.value,
+            "strokeStyle": self.stroke_style._value_,
             "roughness": self.roughness,
             "opacity": self.opacity,
             "groupIds": self.group_ids,
-            "strokeSharpness": self.stroke_sharpness.value,
+            "strokeSharpness": self.stroke_sharpness._value_,
             "seed": self.seed,
             "version": self.version,
             "versionNonce": self.version_nonce,
@@ -282,67 +665,29 @@ class Element:
             "backgroundColor": self.background_color,
             "strokeColor": self.stroke_color,
         }
-        if self.bound_elements:
-            obj["boundElements"] = [be.to_json() for be in self.bound_elements]
-        if self.link:
-            obj["link"] = self.link
-        if self.points:
-            obj["points"] = self.points
-        if self.last_committed_point:
-            obj["lastCommittedPoint"] = self.last_committed_point
-        if self.start_binding:
-            obj["startBinding"] = self.start_binding.to_json()
-        if self.end_binding:
-            obj["endBinding"] = self.end_binding.to_json()
-        if self.start_arrowhead:
-            obj["startArrowhead"] = self.start_arrowhead.value
-        if self.end_arrowhead:
-            obj["endArrowhead"] = self.end_arrowhead.value
-        if self.text:
-            obj["text"] = self.text
-        if self.font_size:
-            obj["fontSize"] = self.font_size
-        if self.font_family:
-            obj["fontFamily"] = self.font_family
-        if self.text_align:
-            obj["textAlign"] = self.text_align.value
-        if self.vertical_align:
-            obj["verticalAlign"] = self.vertical_align.value
-        if self.baseline:
-            obj["baseline"] = self.baseline
-        if self.container_id:
-            obj["containerId"] = self.container_id
-        if self.original_text:
-            obj["originalText"] = self.original_text
-        if self.pressures:
-            obj["pressures"] = self.pressures
-        if self.simulate_pressure:
-            obj["simulatePressure"] = self.simulate_pressure
-        if self.status:
-            obj["status"] = self.status
-        if self.file_id:
-            obj["fileId"] = self.file_id
-        if self.scale:
-            obj["scale"] = self.scale
+        for attr, key, encode, _ in _ELEMENT_OPTIONAL_FIELDS:
+            value = getattr(self, attr)
+            if value:
+                obj[key] = encode(value) if encode else value
         return obj
 
     @classmethod
     def from_json(cls, json_obj: Dict[str, Any]):
         obj = cls(
             id=json_obj["id"],
-            type=TypeEnum(json_obj["type"]),
+            type=_TYPE_BY_VALUE[json_obj["type"]],
             x=json_obj["x"],
             y=json_obj["y"],
             width=json_obj["width"],
             height=json_obj["height"],
             angle=json_obj["angle"],
-            fill_style=Style(json_obj["fillStyle"]),
+            fill_style=_STYLE_BY_VALUE[json_obj["fillStyle"]],
             stroke_width=json_obj["strokeWidth"],
-            stroke_style=StrokeStyle(json_obj["strokeStyle"]),
+            stroke_style=_STROKE_STYLE_BY_VALUE[json_obj["strokeStyle"]],
             roughness=json_obj["roughness"],
             opacity=json_obj["opacity"],
             group_ids=json_obj["groupIds"],
-            stroke_sharpness=StrokeSharpness(json_obj["strokeSharpness"]),
+            stroke_sharpness=_STROKE_SHARPNESS_BY_VALUE[json_obj["strokeSharpness"]],
             seed=json_obj["seed"],
             version=json_obj["version"],
             version_nonce=json_obj["versionNonce"],
@@ -351,70 +696,25 @@ class Element:
             background_color=json_obj["backgroundColor"],
             stroke_color=json_obj["strokeColor"],
         )
-        if json_obj.get("boundElements") is not None:
-            obj.bound_elements = [
-                BoundElement.from_json(be) for be in json_obj["boundElements"]
-            ]
-        if json_obj.get("link") is not None:
-            obj.link = json_obj["link"]
-        if json_obj.get("points") is not None:
-            obj.points = json_obj["points"]
-        if json_obj.get("lastCommittedPoint") is not None:
-            obj.last_committed_point = json_obj["lastCommittedPoint"]
-        if json_obj.get("startBinding") is not None:
-            obj.start_binding = Binding.from_json(json_obj["startBinding"])
-        if json_obj.get("endBinding") is not None:
-            obj.end_binding = Binding.from_json(json_obj["endBinding"])
-        if json_obj.get("startArrowhead") is not None:
-            obj.start_arrowhead = Arrowhead(json_obj["startArrowhead"])
-        if json_obj.get("endArrowhead") is not None:
-            obj.end_arrowhead = Arrowhead(json_obj["endArrowhead"])
-        if json_obj.get("text") is not None:
-            obj.text = json_obj["text"]
-        if json_obj.get("fontSize") is not None:
-            obj.font_size = json_obj["fontSize"]
-        if json_obj.get("fontFamily") is not None:
-            obj.font_family = json_obj["fontFamily"]
-        if json_obj.get("textAlign") is not None:
-            obj.text_align = TextAlign(json_obj["textAlign"])
-        if json_obj.get("verticalAlign") is not None:
-            obj.vertical_align = VerticalAlign(json_obj["verticalAlign"])
-        if json_obj.get("baseline") is not None:
-            obj.baseline = json_obj["baseline"]
-        if json_obj.get("containerId") is not None:
-            obj.container_id = json_obj["containerId"]
-        if json_obj.get("originalText") is not None:
-            obj.original_text = json_obj["originalText"]
-        if json_obj.get("pressures") is not None:
-            obj.pressures = json_obj["pressures"]
-        if json_obj.get("simulatePressure") is not None:
-            obj.simulate_pressure = json_obj["simulatePressure"]
-        if json_obj.get("status") is not None:
-            obj.status = json_obj["status"]
-        if json_obj.get("fileId") is not None:
-            obj.file_id = json_obj["fileId"]
-        if json_obj.get("scale") is not None:
-            obj.scale = json_obj["scale"]
+        for attr, key, _, decode in _ELEMENT_OPTIONAL_FIELDS:
+            value = json_obj.get(key)
+            if value is not None:
+                setattr(obj, attr, decode(value) if decode else value)
         return obj
 
     @classmethod
-    def from_svg_edge_path(cls, edge_path: bs4.element.Tag) -> list["Element"]:
-        # The element looks like this:
+    def from_svg_edge_path(cls, path: etree._Element, edge_id: str, style: Optional[str]) -> list["Element"]:
+        # Converts the <path> of an edge. The id and style come from the edge group when there is one, which looks
+        #  like this:
         # <g class="edgePath LS-A LE-B" id="L-A-B" style="opacity: 1;"><path class="path" d="M37.4375,85.60759244689221L41.604166666666664,83.79799370574351C45.770833333333336,81.9883949645948,54.104166666666664,78.36919748229741,62.4375,78.37778055933052C70.77083333333333,78.38636363636364,79.10416666666667,82.02272727272727,83.27083333333333,83.84090909090908L87.4375,85.6590909090909" marker-end="url(#arrowhead48)" style="fill:none"></path><defs><marker id="arrowhead48" markerheight="6" markerunits="strokeWidth" markerwidth="8" orient="auto" refx="9" refy="5" viewbox="0 0 10 10"><path class="arrowheadPath" d="M 0 0 L 10 5 L 0 10 z" style="stroke-width: 1; stroke-dasharray: 1, 0;"></path></marker></defs></g>
 
-        # Get the path from the path attribute
-        path = edge_path.find("path")
-
-        if path is None:
-            return []
+        edge_path_style = parse_style(style)
 
         selves = cls.from_svg_path(path)
         for self in selves:
-            # Get the ID from the ID attribute
-            self.id = edge_path["id"]
+            self.id = edge_id
 
             # Get the opacity from the style
-            edge_path_style = parse_style(edge_path.get("style"))
             if edge_path_style.get("opacity"):
                 self.opacity = int(edge_path_style["opacity"] * 100)
 
@@ -422,11 +722,11 @@ class Element:
 
 
     @classmethod
-    def from_svg_path(cls, path: bs4.element.Tag) -> List["Element"]:
+    def from_svg_path(cls, path: etree._Element) -> List["Element"]:
         self = cls(TypeEnum.LINE)
 
         # Get the other points
-        d = path["d"].replace(",", " ").split()
+        d = path.get("d")
 
         # Get the stroke width if it exists
         path_style = parse_style(path.get("style"))
@@ -434,16 +734,13 @@ class Element:
             stroke_width = path_style["stroke-width"]
             self.stroke_sharpness = StrokeSharpness.ROUND  # Dotted / dashed lines look weird without this
 
-            try:
-                if isinstance(stroke_width, str):
-                    stroke_width = size_attr_to_float(stroke_width)
-                    # Any stroke width of 2px or smaller should just be set to 1. For example,
-                    #  a dotted line has 2px stroke width and a regular line has default stroke width
-                    #  but they're visually the same.
-                    if stroke_width > 2:
-                        self.stroke_width = stroke_width
-            except Exception as e:
-                print(f"Error parsing stroke width: {e}")
+            if isinstance(stroke_width, str):
+                stroke_width = size_attr_to_float(stroke_width)
+                # Any stroke width of 2px or smaller should just be set to 1. For example,
+                #  a dotted line has 2px stroke width and a regular line has default stroke width
+                #  but they're visually the same.
+                if stroke_width > 2:
+                    self.stroke_width = stroke_width
 
         if "stroke-dasharray" in path_style:
             # It might make sense canonically to do dots here instead of dashes but
@@ -453,74 +750,22 @@ class Element:
             else:
                 self.stroke_style = StrokeStyle.DOTTED
 
-        flags = "MmLlHhVvCcSsQqTtAaZz"
-
-        def pop_elts(n: int):
-            elts = []
-            for i in range(n):
-                try:
-                    elts.append(d.pop(0))
-                except Exception as e:
-                    print(f"Overpopped path {e} at {i}")
-                    raise e
-            letter = elts[0][0]
-            assert letter in flags, (letter, elts)
-            if len(elts[0]) == 1:
-                elts.pop(0)
-                elts.append(d.pop(0))
-            else:
-                elts[0] = elts[0][1:]
-            for c in flags:
-                if c in elts[-1]:
-                    elts[-1], put_back = elts[-1].split(c, 1)
-                    d.insert(0, c + put_back)
-                    break
-
-            # All subsequent sets of parameters are considered implicit commands
-            if d and d[0][0] not in flags:
-                d[0] = letter + d[0][0]
-
-            return [float(x.strip("Nn") or 0) for x in elts]
-
-        def pop_x1_y1_x2_y2_x_y():
-            return pop_elts(6)
-
-        def pop_x_y():
-            return pop_elts(2)
-
-        def pop_rx_ry_angle_largearcflag_sweepflag_dx_dy():
-            return pop_elts(7)
-
-        cur_x, cur_y = pop_x_y()
+        segments = parse_path(d)
+        cur_x, cur_y = segments[0][1][:2]
 
         self.x = cur_x
         self.y = cur_y
+        # Points are stored relative to the start of the path. Keep it in locals rather than re-reading the slots
+        #  for every point
+        origin_x, origin_y = cur_x, cur_y
 
         self.points = [[0.0, 0.0]]
 
-        def _bezier_curve_point(point_list, t, x_or_y):
-            if len(point_list) == 1:
-                return point_list[0][x_or_y]
-            return round(
-                _bezier_curve_point(point_list[:-1], t, x_or_y) * (1 - t) + _bezier_curve_point(point_list[1:], t,
-                                                                                                x_or_y) * t, 5)
-
-        def bezier_curve_recursive(def_points, speed=0.1):
-            points = []
-            for t in [_ * speed for _ in range(int((1 + speed * 2) // speed))]:
-                points.append([_bezier_curve_point(def_points, t, 0), _bezier_curve_point(def_points, t, 1)])
-            return points
-
-        while d:
-            if d[0][0] == "L":
-                next_x, next_y = pop_x_y()
-                self.points.append([next_x - self.x, next_y - self.y])
-                cur_x, cur_y = next_x, next_y
-            elif d[0][0] == "M":
-                next_x, next_y = pop_x_y()
-                self.points.append([next_x - self.x, next_y - self.y])
-                cur_x, cur_y = next_x, next_y
-            elif d[0][0] in "Nn":
+        for c, args in segments[1:]:
+            if len(args) < _PATH_COMMAND_ARITY.get(c, 0):
+                # Truncated path data, e.g. an arc missing its end point
+                break
+            if any(isnan(arg) for arg in args):
                 # Something I saw in the wild with this diagram:
                 """
                 requirementDiagram
@@ -544,36 +789,40 @@ class Element:
                 "Traffic simulation" - verifies -> "No. of messages"
                 """
                 # Note the typo in the above withb "No. of users" instead of "No. users"
-                d.pop(0)
-            elif d[0][0] == "C":
-                x1, y1, x2, y2, next_x, next_y = pop_x1_y1_x2_y2_x_y()
-                curve = [[x1 - self.x, y1 - self.y],
-                         [x2 - self.x, y2 - self.y],
-                         [next_x - self.x, next_y - self.y]]
+                continue
+            if c == "L":
+                next_x, next_y = args
+                self.points.append([next_x - origin_x, next_y - origin_y])
+                cur_x, cur_y = next_x, next_y
+            elif c == "M":
+                next_x, next_y = args
+                self.points.append([next_x - origin_x, next_y - origin_y])
+                cur_x, cur_y = next_x, next_y
+            elif c == "C":
+                x1, y1, x2, y2, next_x, next_y = args
+                curve = [[x1 - origin_x, y1 - origin_y],
+                         [x2 - origin_x, y2 - origin_y],
+                         [next_x - origin_x, next_y - origin_y]]
                 if len({curve[0][0], curve[1][0], curve[2][0]}) > 1 and len({curve[0][1], curve[1][1], curve[2][1]}) > 1:
-                    curve = bezier_curve_recursive(curve, 0.1)
+                    curve = bezier_curve(curve)
                 self.points.extend(curve)
 
                 cur_x, cur_y = next_x, next_y
-            elif d[0][0] in "Aa":
-                c = d[0][0]
-                try:
-                    rx, ry, angle, largearcflag, sweepflag, dx, dy = pop_rx_ry_angle_largearcflag_sweepflag_dx_dy()
-                except IndexError:
-                    break
+            elif c in "Aa":
+                rx, ry, angle, largearcflag, sweepflag, dx, dy = args
                 if c == "A":
                     next_x, next_y = dx, dy
                 else:
                     next_x, next_y = cur_x + dx, cur_y + dy
-                curve = [[next_x - self.x, next_y - self.y]]
+                curve = [[next_x - origin_x, next_y - origin_y]]
                 self.points.extend(curve)
                 cur_x, cur_y = next_x, next_y
-            elif d[0][0] == "l":
-                next_dx, next_dy = pop_x_y()
+            elif c == "l":
+                next_dx, next_dy = args
                 next_x, next_y = cur_x + next_dx, cur_y + next_dy
-                self.points.append([next_x - self.x, next_y - self.y])
+                self.points.append([next_x - origin_x, next_y - origin_y])
                 cur_x, cur_y = next_x, next_y
-            elif d[0][0] in "zZ":
+            elif c in "zZ":
                 """
                 Close the current subpath by connecting the last point of the path with its initial point. 
                 If the two points are at different coordinates, a straight line is drawn between those two points.
@@ -581,10 +830,11 @@ class Element:
                 self.points.append([0.0, 0.0])
                 break
             else:
-                raise Exception("Unknown path command: " + d[0])
+                raise Exception("Unknown path command: " + c)
 
-        self.width = max(x for x, y in self.points) - min(x for x, y in self.points)
-        self.height = max(y for x, y in self.points) - min(y for x, y in self.points)
+        xs, ys = zip(*self.points)
+        self.width = max(xs) - min(xs)
+        self.height = max(ys) - min(ys)
 
         # TODO: I want this but it breaks cylinders
         # Clean self.points to remove any midpoints on straight lines
@@ -621,16 +871,16 @@ class Element:
         if self.type == TypeEnum.LINE:
             self.stroke_sharpness = StrokeSharpness.ROUND
 
-        print("Path:", self.points)
+        logger.debug("Path: %s", self.points)
 
         return [self]
 
     @classmethod
-    def from_svg_edge_label(cls, edge_label: bs4.element.Tag) -> list["Element"]:
+    def from_svg_edge_label(cls, edge_label: etree._Element) -> list["Element"]:
         # Get edgeLabel span
-        span = edge_label.find("span")
+        span = _find(_XP_SPAN, edge_label)
         if span.get("id"):
-            edge_label.id = span["id"]
+            edge_label.set("id", span.get("id"))
         nodes = cls.from_svg_node(edge_label)
         for node in nodes:
             if node.type == TypeEnum.TEXT:
@@ -640,7 +890,7 @@ class Element:
         return nodes
 
     @classmethod
-    def from_svg_node(cls, node: bs4.element.Tag) -> list["Element"]:
+    def from_svg_node(cls, node: etree._Element) -> list["Element"]:
 
         # <g class="node default" id="flowchart-A-17" style="opacity: 1;"
         # transform="translate(22.71875,92)"><rect class="label-container"
@@ -650,40 +900,49 @@ class Element:
         # <div style="display: inline-block; white-space: nowrap;"
         # xmlns="http://www.w3.org/1999/xhtml">A</div></foreignobject></g></g></g>
 
-        try:
-            tsfm_x, tsfm_y = parse_transform(node["transform"])
-        except Exception as e:
-            tsfm_x = tsfm_y = 0.0
+        tsfm_x, tsfm_y = parse_transform(node.get("transform"))
 
         # If the node has the "root" class, do a recursive search for nodes
-        if node.get("class") and "root" in node["class"]:
+        if _has_class(node, "root"):
             return cls.from_svg_tree(node, tsfm_x=tsfm_x, tsfm_y=tsfm_y, tree_id=random_id())
 
         objs = []
         txt_objs = []
 
-        print("NODE:", node)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("NODE: %s", etree.tostring(node, encoding=str))
 
-        for fo in node.find_all("foreignobject"):
+        # Gather every shape this converter handles in a single walk over the subtree
+        shapes = {"foreignobject": [], "line": [], "text": []}
+        first_shapes = {}
+        for child in node.iter(*_NODE_SHAPE_TAGS):
+            if child.tag in shapes:
+                shapes[child.tag].append(child)
+            else:
+                first_shapes.setdefault(child.tag, child)
 
-            if not fo.text:
-                print(f"Skip empty foreignobject: {fo}")
+        for fo in shapes["foreignobject"]:
+            fo_text = _text(fo)
+            if not fo_text:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Skip empty foreignobject: %s", etree.tostring(fo, encoding=str))
                 continue
 
-            txt = cls(TypeEnum.TEXT)
+            txt = cls(TypeEnum.TEXT, id=fo.get("id") or random_id())
             txt.x = tsfm_x
             txt.y = tsfm_y
-            txt.width = float(fo["width"])
-            txt.height = float(fo["height"])
+            txt.width = float(fo.get("width"))
+            txt.height = float(fo.get("height"))
 
             sub_tsfm = fo.get("transform")
             if sub_tsfm:
-                txt.x += float(sub_tsfm.split("translate(")[1].split(",")[0])
-                txt.y += float(sub_tsfm.split("translate(")[1].split(",")[1][:-1])
+                sub_tsfm_x, sub_tsfm_y = parse_transform(sub_tsfm)
+                txt.x += sub_tsfm_x
+                txt.y += sub_tsfm_y
             else:
                 txt.x -= txt.width / 2
             txt.y -= txt.height / 2
-            txt.text = fo.text
+            txt.text = fo_text
             txt.original_text = txt.text
 
             txt.font_size = 16
@@ -691,25 +950,21 @@ class Element:
             txt.text_align = TextAlign.CENTER
             txt.vertical_align = VerticalAlign.MIDDLE
             txt.baseline = txt.height - (txt.height - txt.font_size) / 2
-            txt.id = fo.get("id", txt.id)
             objs.append(txt)
             txt_objs.append(txt)
 
         line_objs = []
-        for line in node.find_all("line"):
+        for line in shapes["line"]:
             ln = cls.from_svg_line(line)[0]
 
             # Hackfix for requirements title lines
-            if "req-title-line" in line.get("class", ""):
+            if _has_class(line, "req-title-line"):
                 ln.x -= ln.width / 2
                 ln.y -= ln.width / 2
 
             ln.y += tsfm_y
             ln.x += tsfm_x
-            ln.bound_elements = []
-            for txt in txt_objs:
-                txt.container_id = ln.id
-                ln.bound_elements.append(BoundElement(txt.id, txt.type))
+            _bind(ln, txt_objs)
             objs.append(ln)
             line_objs.append(ln)
 
@@ -720,53 +975,40 @@ class Element:
         rect_width = 0
         rect_height = 0
 
-        rectangle = node.find("rect")
+        rectangle = first_shapes.get("rect")
         rect_obj = None
-        if rectangle:
+        if rectangle is not None:
             rect = cls.from_svg_rectangle(rectangle)[0]
             rect.y += tsfm_y
             rect.x += tsfm_x
             rect.x -= rect.width / 2
             rect.y -= rect.height / 2
-            rect.bound_elements = []
-            for txt in joiner_objs:
-                txt.container_id = rect.id
-                rect.bound_elements.append(BoundElement(txt.id, txt.type))
+            _bind(rect, joiner_objs)
             objs.append(rect)
             rect_obj = rect
             rect_width = rect.width
             rect_height = rect.height
 
 
-        for text in node.find_all("text"):
+        ignored_texts = _ignored_tspan_texts()
+        for text in shapes["text"]:
             txt_x, txt_y = size_attr_to_float(text.get("x")), size_attr_to_float(text.get("y"))
             total_dy = 0
             total_dx = 0
-            text_id = text.get("id", random_id())
-            tspans = list(text.find_all("tspan"))
+            text_id = text.get("id") or random_id()
+            tspans = list(text.iter("tspan"))
             if tspans:
                 for i, tspan in enumerate(tspans):
-                    if IGNORE_UNDEFINED_REQUIREMENTS:
-                        if tspan.text in [
-                            "Id: undefined",
-                            "Text: undefined",
-                            "Risk: undefined",
-                            "Verification: undefined",
-                        ]:
-                            continue
-                    if IGNORE_NOT_SPECIFIED_TYPE:
-                        if tspan.text == "Type: Not Specified":
-                            continue
-                    if IGNORE_NONE_DOC_REF:
-                        if tspan.text == "Doc Ref: None":
-                            continue
-                    txt = cls(TypeEnum.TEXT)
+                    tspan_text = _text(tspan)
+                    if tspan_text in ignored_texts:
+                        continue
+                    txt = cls(TypeEnum.TEXT, id=f"{text_id}-{i}")
                     tspan_x, tspan_y = size_attr_to_float(tspan.get("x")), size_attr_to_float(tspan.get("y"))
                     total_dy += size_attr_to_float(tspan.get("dy"))
                     total_dx += size_attr_to_float(tspan.get("dx"))
                     txt.x = txt_x + tspan_x + total_dx + tsfm_x
                     txt.y = txt_y + tspan_y + total_dy + tsfm_y
-                    txt.text = tspan.text
+                    txt.text = tspan_text
                     txt.original_text = txt.text
                     txt.font_size = 16
                     txt.font_family = 2
@@ -777,9 +1019,10 @@ class Element:
                         txt.text_align = TextAlign.LEFT
                     txt.vertical_align = VerticalAlign.MIDDLE
                     txt.baseline = txt.height - (txt.height - txt.font_size) / 2
-                    txt.id = f"{text_id}-{i}"
                     txt.group_ids = [text_id]
                     txt.height = txt.font_size
+                    # Kept at a full em per character: the requirementsDiagram hackfix below shifts by this width
+                    #  and was tuned against it
                     txt.width = rect_width or (len(txt.text) * txt.font_size)
                     if rect_width:
                         txt.x -= rect_width / 2
@@ -797,59 +1040,50 @@ class Element:
                 txt.x += tsfm_x
                 txt.y += tsfm_y
 
-        polygon = node.find("polygon")
-        if polygon:
+        polygon = first_shapes.get("polygon")
+        if polygon is not None:
             poly = cls.from_svg_polygon(polygon)[0]
             poly.y += tsfm_y
             poly.x += tsfm_x
             poly.x -= poly.width / 2
-            poly.bound_elements = []
-            for txt in joiner_objs:
-                txt.container_id = poly.id
-                poly.bound_elements.append(BoundElement(txt.id, txt.type))
+            _bind(poly, joiner_objs)
             objs.append(poly)
 
-        circle = node.find("circle")
-        if circle:
+        circle = first_shapes.get("circle")
+        if circle is not None:
             circ = cls.from_svg_circle(circle)[0]
             circ.y += tsfm_y
             circ.x += tsfm_x
             circ.y -= circ.height / 4
-            circ.bound_elements = []
-            for txt in joiner_objs:
-                txt.container_id = circ.id
-                circ.bound_elements.append(BoundElement(txt.id, txt.type))
+            _bind(circ, joiner_objs)
             objs.append(circ)
 
-        path = node.find("path")
-        if path:
+        path = first_shapes.get("path")
+        if path is not None:
             pth = cls.from_svg_path(path)[0]
             pth.y += tsfm_y
             pth.x += tsfm_x
             pth.x -= pth.width / 2
             pth.y -= pth.height / 2
-            pth.bound_elements = []
-            for txt in joiner_objs:
-                txt.container_id = pth.id
-                pth.bound_elements.append(BoundElement(txt.id, txt.type))
+            _bind(pth, joiner_objs)
             objs.append(pth)
 
         group_id = random_id()
         for obj in objs:
             obj.group_ids = [group_id]
 
-        print("->", objs)
+        logger.debug("-> %s", objs)
 
         return objs
 
     @classmethod
-    def from_svg_rectangle(cls, rectangle: bs4.element.Tag, include_xy=False) -> list["Element"]:
+    def from_svg_rectangle(cls, rectangle: etree._Element, include_xy: bool = False) -> list["Element"]:
         # <rect height="19" rx="0" ry="0" width="58.203125"></rect>
         self: 'Element' = cls(TypeEnum.RECTANGLE)
 
         rx = float(rectangle.get("rx") or "0")
         ry = float(rectangle.get("ry") or "0")
-        print("RXRY", rx, ry)
+        logger.debug("RXRY %s %s", rx, ry)
         if rx or ry:
             self.stroke_sharpness = StrokeSharpness.ROUND
 
@@ -857,27 +1091,23 @@ class Element:
                 # Pretty sure that's an ellipse
                 self.type = TypeEnum.ELLIPSE
 
-        self.height = size_attr_to_float(rectangle["height"])
-        self.width = size_attr_to_float(rectangle["width"])
+        self.height = size_attr_to_float(rectangle.get("height"))
+        self.width = size_attr_to_float(rectangle.get("width"))
         if include_xy:
             if rectangle.get("x", "0") != "0":
-                self.x = float(rectangle["x"])
+                self.x = float(rectangle.get("x"))
             if rectangle.get("y", "0") != "0":
-                self.y = float(rectangle["y"])
+                self.y = float(rectangle.get("y"))
         return [self]
 
     @classmethod
-    def from_svg_polygon(cls, polygon: bs4.element.Tag) -> list["Element"]:
+    def from_svg_polygon(cls, polygon: etree._Element) -> list["Element"]:
         # <polygon class="label-container" transform="translate(-69.88050041198731,69.88050041198731)" points="69.88050041198731,0 139.76100082397463,-69.88050041198731 69.88050041198731,-139.76100082397463 0,-69.88050041198731"></polygon>
         self = cls(TypeEnum.DIAMOND)
         self.x, self.y = parse_transform(polygon.get("transform"))
-        pairs = polygon["points"].split(" ")
-        points = []
-        for pair in pairs:
-            x, y = pair.split(",")
-            points.append((float(x), float(y)))
-        width = max(points, key=lambda p: p[0])[0] - min(points, key=lambda p: p[0])[0]
-        height = max(points, key=lambda p: p[1])[1] - min(points, key=lambda p: p[1])[1]
+        xs, ys = zip(*(map(float, pair.split(",")) for pair in polygon.get("points").split()))
+        width = max(xs) - min(xs)
+        height = max(ys) - min(ys)
         self.width = width
         self.height = height
         self.x += width / 2
@@ -887,24 +1117,26 @@ class Element:
         return [self]
 
     @classmethod
-    def from_svg_circle(cls, circle: bs4.element.Tag) -> list["Element"]:
+    def from_svg_circle(cls, circle: etree._Element) -> list["Element"]:
         # <circle class="label-container" r="33.765625" x="-33.765625" y="-19.5"></circle>
         self = cls(TypeEnum.ELLIPSE)
         self.x = float(circle.get("x", "0"))
         self.y = float(circle.get("y", "0"))
-        self.width = self.height = float(circle["r"]) * 2
+        self.width = self.height = float(circle.get("r")) * 2
         # self.x += 10
         return [self]
 
     @classmethod
-    def from_svg_line(cls, line: bs4.element.Tag) -> list["Element"]:
+    def from_svg_line(cls, line: etree._Element) -> list["Element"]:
         # <line class="divider" x1="-59.5859375" x2="59.5859375" y1="-44" y2="-44"></line>
         self = cls(TypeEnum.LINE)
-        self.x = float(line["x1"])
-        self.y = float(line["y1"])
-        self.width = abs(float(line["x2"]) - self.x)
-        self.height = abs(float(line["y2"]) - self.y)
-        self.points = [[0, 0], [float(line["x2"]) - self.x, float(line["y2"]) - self.y]]
+        self.x = float(line.get("x1"))
+        self.y = float(line.get("y1"))
+        dx = float(line.get("x2")) - self.x
+        dy = float(line.get("y2")) - self.y
+        self.width = abs(dx)
+        self.height = abs(dy)
+        self.points = [[0, 0], [dx, dy]]
         if line.get("marker-start", ""):
             self.start_arrowhead = Arrowhead.TRIANGLE
             self.type = TypeEnum.ARROW
@@ -914,69 +1146,68 @@ class Element:
         return [self]
 
     @classmethod
-    def from_svg_tree(cls, tree: BeautifulSoup | bs4.element.Tag, tsfm_x=0., tsfm_y=0., tree_id=None) -> list[
-        "Element"]:
+    def from_svg_tree(cls, tree: etree._Element, tsfm_x: float = 0., tsfm_y: float = 0.,
+                      tree_id: Optional[str] = None) -> list["Element"]:
         if tree_id is None:
             tree_id = random_id()
 
         elements = []
-
-        # For every "path" element that is a child of edgePaths, create a fake <g> element and do the same
-        edgePaths = tree.find('g', class_='edgePaths')
-        if edgePaths:
-            for i, path in enumerate(edgePaths.find_all('path', recursive=False)):
-                g = bs4.element.Tag(name='g')
-                g['class'] = 'edgePath'
-                g.append(path)
-                g['id'] = f'root-edgepath-{i}'
-                g['style'] = path['style']
-                elements += Element.from_svg_edge_path(g)
-            for edge_path in edgePaths.find_all('g', class_='edgePath', recursive=False):
-                elements += Element.from_svg_edge_path(edge_path)
-
-        edgeLabels = tree.find('g', class_='edgeLabels')
-        if edgeLabels:
-            for edge_label in edgeLabels.find_all('g', class_='edgeLabel', recursive=False):
-                elements += Element.from_svg_edge_label(edge_label)
-
-        nodes = tree.find('g', class_='nodes')
-        if nodes:
-            for node in nodes.find_all('g', class_='node', recursive=False):
-                elements += Element.from_svg_node(node)
-            for root in nodes.find_all('g', class_='root', recursive=False):
-                elements += Element.from_svg_node(root)
-            a = nodes.find_all('a', recursive=False)
-            for a in a:
-                transform = a.get('transform')
-                a_tsfm_x = a_tsfm_y = 0
-                if transform:
-                    m = re.search(r'translate\(([-\d.]+),\s*([-\d.]+)', transform)
-                    if m:
-                        a_tsfm_x = float(m.group(1))
-                        a_tsfm_y = float(m.group(2))
+        groups = _find_tree_groups(tree)
+
+        # Edges are either bare "path" children of edgePaths or wrapped in an edgePath group that carries their id
+        #  and style
+        edgePaths = groups.get("edgePaths")
+        if edgePaths is not None:
+            by_tag, by_class = _bucket_children(edgePaths, tags=("path",), classes=("edgePath",))
+            for i, path in enumerate(by_tag["path"]):
+                elements.extend(Element.from_svg_edge_path(path, f'root-edgepath-{i}', path.get('style')))
+            for edge_path in by_class["edgePath"]:
+                path = _find(_XP_PATH, edge_path)
+                if path is not None:
+                    edge_id = edge_path.get('id') or random_id()
+                    elements.extend(Element.from_svg_edge_path(path, edge_id, edge_path.get('style')))
+
+        edgeLabels = groups.get("edgeLabels")
+        if edgeLabels is not None:
+            _, by_class = _bucket_children(edgeLabels, classes=("edgeLabel",))
+            for edge_label in by_class["edgeLabel"]:
+                elements.extend(Element.from_svg_edge_label(edge_label))
+
+        nodes = groups.get("nodes")
+        if nodes is not None:
+            by_tag, by_class = _bucket_children(nodes, tags=("a",), classes=("node", "root"))
+            for node in by_class["node"]:
+                elements.extend(Element.from_svg_node(node))
+            for root in by_class["root"]:
+                elements.extend(Element.from_svg_node(root))
+            for a in by_tag["a"]:
+                a_tsfm_x, a_tsfm_y = parse_transform(a.get('transform'))
+                _, a_classes = _bucket_children(a, classes=("node", "root"))
                 link_elements = []
-                for node in a.find_all('g', class_='node', recursive=False):
-                    link_elements += Element.from_svg_node(node)
-                for root in a.find_all('g', class_='root', recursive=False):
-                    link_elements += Element.from_svg_node(root)
+                for node in a_classes["node"]:
+                    link_elements.extend(Element.from_svg_node(node))
+                for root in a_classes["root"]:
+                    link_elements.extend(Element.from_svg_node(root))
                 for link_element in link_elements:
                     link_element.link = a.get('xlink:href')
                     link_element.x += a_tsfm_x
                     link_element.y += a_tsfm_y
-                elements += link_elements
+                elements.extend(link_elements)
 
-        clusters = tree.find('g', class_='clusters')
-        if clusters:
-            for cluster in clusters.find_all('g', class_='cluster', recursive=False):
-                rect = cluster.find('rect')
+        clusters = groups.get("clusters")
+        if clusters is not None:
+            _, by_class = _bucket_children(clusters, classes=("cluster",))
+            for cluster in by_class["cluster"]:
+                rect = _find(_XP_RECT, cluster)
                 rect_elts = Element.from_svg_rectangle(rect, include_xy=True)
 
-                g = cluster.find('g')
+                g = _find(_XP_G, cluster)
                 g_elts = Element.from_svg_node(g)
 
-                elements += rect_elts + g_elts
+                elements.extend(rect_elts)
+                elements.extend(g_elts)
 
-                group_id = g.get('id', random_id())
+                group_id = g.get('id') or random_id()
 
                 c_tsfm_x, c_tsfm_y = parse_transform(cluster.get('transform'))
                 for elt in g_elts + rect_elts:
@@ -994,21 +1225,23 @@ class Element:
                     for g_elt in g_elts:
                         g_elt.x += g_elt.width / 2
 
-                print("RECT_ELTS", rect_elts)
+                logger.debug("RECT_ELTS %s", rect_elts)
 
         if not elements:
             # There are other kinds of graphs that don't adhere to the format above. Let's make a best effort to
             #  parse them by just looking for general elements.
-            svg = tree.find('svg')
-            if svg:
+            svg = _find(_XP_SVG, tree)
+            if svg is not None:
                 is_sequence_diagram = False
 
-                line_xs = []
-                for g in svg.find_all('g', recursive=False):
+                children, _ = _bucket_children(svg, tags=("g", "path", "rect", "line", "text"))
+
+                line_xs = deque()
+                for g in children["g"]:
                     g_elts = Element.from_svg_node(g)
 
                     # Hackfix for sequenceDiagrams
-                    if g.find("rect", class_="actor"):
+                    if _find(_XP_ACTOR_RECT, g) is not None:
                         is_sequence_diagram = True
                         line_x = 0
                         text_y = 0
@@ -1027,7 +1260,7 @@ class Element:
                                 text_y = elt.y
 
                         if not had_line_x and line_xs:
-                            line_x = line_xs.pop(0)
+                            line_x = line_xs.popleft()
 
                         for elt in g_elts:
                             if elt.type == TypeEnum.RECTANGLE:
@@ -1045,33 +1278,33 @@ class Element:
                                     elt.y -= elt.baseline
 
 
-                    elements += g_elts
+                    elements.extend(g_elts)
 
-                for path in svg.find_all('path', recursive=False):
+                for path in children["path"]:
 
                     path_elements = Element.from_svg_path(path)
                     # Hackfix for requirementDiagrams
-                    if "relationshipLine" in path.get('class', ''):
+                    if _has_class(path, "relationshipLine"):
                         for elt in path_elements:
                             elt.x -= 100
                             elt.y -= 100
-                    elements += path_elements
+                    elements.extend(path_elements)
 
                 rect_elts = []
-                for rect in svg.find_all('rect', recursive=False):
-                    rect_elts += Element.from_svg_rectangle(rect, include_xy=True)
-                    elements += rect_elts
+                for rect in children["rect"]:
+                    rect_elts.extend(Element.from_svg_rectangle(rect, include_xy=True))
+                elements.extend(rect_elts)
 
                 line_elts = []
-                for line in svg.find_all('line', recursive=False):
-                    line_elts += Element.from_svg_line(line)
-                elements += line_elts
+                for line in children["line"]:
+                    line_elts.extend(Element.from_svg_line(line))
+                elements.extend(line_elts)
 
-                for i, text in enumerate(svg.find_all('text', recursive=False)):
+                for i, text in enumerate(children["text"]):
                     text_elements = Element.from_svg_text(text)
 
                     # Hackfix for requirementDiagrams
-                    if "relationshipLabel" in text.get('class', ''):
+                    if _has_class(text, "relationshipLabel"):
                         if len(rect_elts) > i:
                             rect_elts[i].x -= 100
                             rect_elts[i].y -= 100
@@ -1090,13 +1323,16 @@ class Element:
                                 elt.width = line_elts[i].width
                                 elt.y = line_elts[i].y - elt.baseline - elt.height / 2
 
-                    elements += text_elements
+                    elements.extend(text_elements)
 
-        for element in elements:
-            element.x += tsfm_x
-            element.y += tsfm_y
+        # The top-level tree has no offset, so only nested roots pay for moving their elements
+        if tsfm_x or tsfm_y:
+            for element in elements:
+                element.x += tsfm_x
+                element.y += tsfm_y
 
-            if tree_id:
+        if tree_id:
+            for element in elements:
                 if element.group_ids:
                     element.group_ids.append(tree_id)
                 else:
@@ -1105,37 +1341,26 @@ class Element:
         return elements
 
     @classmethod
-    def from_svg_text(cls, text):
-        self = cls(TypeEnum.TEXT)
+    def from_svg_text(cls, text: etree._Element) -> list["Element"]:
+        self = cls(TypeEnum.TEXT, id=text.get('id') or random_id())
         x = size_attr_to_float(text.get('x'))
         y = size_attr_to_float(text.get('y'))
         self.x = x
         self.y = y
-        self.text = text.text
+        self.text = _text(text)
         self.height = self.font_size = 16
         dy = size_attr_to_float(text.get('dy'), font_size=self.font_size)
         self.y += dy
-        self.width = len(self.text) * self.font_size
         self.font_family = 2
-        self.text_align = TextAlign.LEFT
-        self.vertical_align = VerticalAlign.MIDDLE
+        self.width = estimate_text_width(self.text, self.font_size, self.font_family)
+        self.text_align = _TEXT_ANCHOR_ALIGN.get(text.get("text-anchor"), TextAlign.LEFT)
+        self.vertical_align = _DOMINANT_BASELINE_ALIGN.get(text.get("dominant-baseline"), VerticalAlign.MIDDLE)
         self.baseline = self.height - (self.height - self.font_size) / 2
-        if text.get("text-anchor") == "middle":
-            self.text_align = TextAlign.CENTER
-        elif text.get("text-anchor") == "end":
-            self.text_align = TextAlign.RIGHT
-        if text.get("dominant-baseline") == "middle":
-            self.vertical_align = VerticalAlign.MIDDLE
-        elif text.get("dominant-baseline") == "hanging":
-            self.vertical_align = VerticalAlign.TOP
-        elif text.get("dominant-baseline") == "text-after-edge":
-            self.vertical_align = VerticalAlign.BOTTOM
-        self.id = text.get('id', random_id())
         return [self]
 
 
 
-@dataclass
+@dataclass(slots=True)
 class File:
     mime_type: str
     id: str
@@ -1151,7 +1376,7 @@ class File:
         }
 
     @staticmethod
-    def from_json(json_obj):
+    def from_json(json_obj: Dict[str, Any]):
         return File(
             mime_type=json_obj["mimeType"],
             id=json_obj["id"],
@@ -1161,10 +1386,9 @@ class File:
 
 
 if __name__ == '__main__':
-    with open(r"C:\Users\windo\Pictures\example7.excalidraw", "r") as f:
+    with open(r"C:\Users\windo\Pictures\example7.excalidraw", "rb") as f:
         data = f.read()
-    json_obj = json.loads(data)
-    excalidraw = Excalidraw.from_json(json_obj)
-    with open(r"C:\Users\windo\Pictures\example7-2.excalidraw", "w") as f:
-        f.write(json.dumps(excalidraw.to_json()))
+    excalidraw = Excalidraw.loads(data)
+    with open(r"C:\Users\windo\Pictures\example7-2.excalidraw", "wb") as f:
+        f.write(excalidraw.dumps_bytes())
     print(excalidraw.to_json())
@@ -1,4 +1,5 @@
-import json
+import logging
+import re
 import time
 
 import pyperclip
@@ -7,25 +8,58 @@ from pynput import keyboard
 import excalidraw
 import mermaid
 
+logger = logging.getLogger(__name__)
+
+
+# Common slips in hand-written graphs, what they are replaced with and the warning given when one is fixed
+GRAPH_FIXUPS = {
+    "graph:": ("graph", "You seem to have accidentally added a colon to the graph. Removing it...."),
+    " -> ": (" --> ", "You seem to have accidentally added a -> to the graph. Replacing with -->"),
+    " - ": (" -- ", "You seem to have accidentally added a - to the graph. Replacing with --"),
+}
+# Arrows aren't fixed up in requirement diagrams, which use "-" and "->" in their relationship syntax
+_GRAPH_FIXUP_RE = re.compile("|".join(map(re.escape, GRAPH_FIXUPS)))
+_REQUIREMENT_FIXUP_RE = re.compile(re.escape("graph:"))
+
+
+def fix_graph_text(text, pattern):
+    # Apply every fixup matched by pattern in a single pass over the text, warning once per kind of slip
+    fixed = set()
+
+    def fix(match):
+        slip = match.group(0)
+        replacement, warning = GRAPH_FIXUPS[slip]
+        if slip not in fixed:
+            fixed.add(slip)
+            logger.warning(warning)
+        return replacement
+
+    return pattern.sub(fix, text)
+
+
+# The clipboard text that was last converted (or found to hold nothing to convert), or the result written back to it,
+#  so that a Ctrl+C that didn't copy anything new doesn't trigger another conversion
+last_clipboard = None
+
 
 def get_clipboard_text():
     return pyperclip.paste()
 
 
-def get_clipboard_as_graph():
-    text = get_clipboard_text()
+def get_clipboard_as_graph(text=None):
+    if text is None:
+        text = get_clipboard_text()
 
     if not isinstance(text, str):
-        print(f"Clipboard is not a string: {text}")
+        logger.warning("Clipboard is not a string: %s", text)
         return None
 
     if "excalidraw/clipboard" in text:
         try:
-            parsed = json.loads(text)
-            excali = excalidraw.Excalidraw.from_json(parsed)
+            excali = excalidraw.Excalidraw.loads(text)
             text = excali.elements[0].original_text
         except Exception as e:
-            print("Error parsing clipboard:", e)
+            logger.warning("Error parsing clipboard: %s", e)
     else:
         return ""
 
@@ -33,11 +67,8 @@ def get_clipboard_as_graph():
         return ""
     text = text.strip()
 
-    if "graph:" in text:
-        print(f"Warning: You seem to have accidentally added a colon to the graph. Removing it....")
-        text = text.replace("graph:", "graph")
-
     if "requirementDiagram" in text:
+        text = fix_graph_text(text, _REQUIREMENT_FIXUP_RE)
         d = {
             "perfReq": "performanceRequirement",
             "funcReq": "functionalRequirement",
@@ -53,19 +84,13 @@ def get_clipboard_as_graph():
         }
         for k, v in d.items():
             if f"{k} " in text:
-                print(f"Warning: Replacing '{k} ' with '{v} '")
+                logger.warning("Replacing '%s ' with '%s '", k, v)
                 text = text.replace(f"{k} ", f"{v} ")
     else:
-        if " -> " in text:
-            print(f"Warning: You seem to have accidentally added a -> to the graph. Replacing with -->")
-            text = text.replace(" -> ", " --> ")
-
-        if " - " in text:
-            print(f"Warning: You seem to have accidentally added a - to the graph. Replacing with --")
-            text = text.replace(" - ", " -- ")
+        text = fix_graph_text(text, _GRAPH_FIXUP_RE)
 
     if not text:
-        print("Clipboard is empty")
+        logger.info("Clipboard is empty")
         return None
 
     return text
@@ -91,23 +116,26 @@ def get_clipboard_as_graph():
 
 
 def copy_to_clipboard(text):
+    global last_clipboard
     pyperclip.copy(text)
+    last_clipboard = text
 
 
-def convert_clipboard():
-    text = get_clipboard_as_graph()
+def convert_clipboard(clipboard=None):
+    text = get_clipboard_as_graph(clipboard)
     mermaid_svg = mermaid.mermaid_to_svg(text)
-    print(mermaid_svg)
+    logger.debug("SVG: %s", mermaid_svg)
     if not mermaid_svg:
-        print("No mermaid diagram found in clipboard", text)
+        logger.info("No mermaid diagram found in clipboard %s", text)
         return False
     excali = excalidraw.Excalidraw.from_svg(mermaid_svg)
-    excali_json = excali.to_json()
-    if not excali_json["elements"]:
-        print("No elements found in clipboard", text)
+    if not excali.elements:
+        logger.info("No elements found in clipboard %s", text)
         return False
-    copy_to_clipboard(json.dumps(excali_json))
-    print("Copied to clipboard:", excali_json)
+    excali_json = excali.dumps()
+    copy_to_clipboard(excali_json)
+    logger.info("Copied diagram with %d elements to clipboard", len(excali.elements))
+    logger.debug("Copied to clipboard: %s", excali_json)
     return True
 
 
@@ -117,16 +145,21 @@ current = set()
 
 
 def on_press(key):
+    global last_clipboard
     if key in CONTROL_KEYS:
         current.add(key)
 
     if current.issubset(CONTROL_KEYS) and repr(key).lower() in ["c", r"'\x03'"]:
         time.sleep(0.05)
+        clipboard = get_clipboard_text()
+        if clipboard == last_clipboard:
+            return
         try:
-            convert_clipboard()
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
+            if not convert_clipboard(clipboard):
+                last_clipboard = clipboard
+        except Exception:
+            # Left unrecorded so that pressing Ctrl+C again retries the same text
+            logger.exception("Failed to convert clipboard")
 
 
 def on_release(key):
@@ -134,6 +167,7 @@ def on_release(key):
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     with keyboard.Listener(on_press=on_press, on_release=on_release) as listener:
         listener.join()
 
@@ -1,12 +1,82 @@
 import base64
+import hashlib
 import json
+import logging
+import os
+import re
+import tempfile
+from functools import lru_cache
 
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 
 import excalidraw
 
+logger = logging.getLogger(__name__)
+
+# Rendered diagrams are kept here, keyed by a hash of the graph source, so repeat conversions skip mermaid.ink
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "excalimaid")
+
+# Shared so that repeat conversions reuse the keep-alive connection to mermaid.ink instead of a new TLS handshake
+_SESSION = requests.Session()
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+
+# A rendered diagram: an <svg> root, optionally after an XML declaration
+_SVG_RE = re.compile(r"\s*(?:<\?xml[^>]*>\s*)?<svg\b")
+
+
+class _NotRendered(Exception):
+    pass
+
+
 def mermaid_to_svg(graph: str) -> str:
+    try:
+        return _rendered_svg(graph)
+    except _NotRendered:
+        return ""
+
+
+@lru_cache(maxsize=256)
+def _rendered_svg(graph: str) -> str:
+    cache_path = os.path.join(CACHE_DIR, hashlib.sha256(graph.encode()).hexdigest() + ".svg")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            svg = f.read()
+        if _SVG_RE.match(svg):
+            return svg
+    except OSError:
+        pass
+
+    svg = fetch_svg(graph)
+    # Failed renders (error pages, outages) raise rather than return, so that neither lru_cache nor the disk cache
+    #  keeps them and the next call tries mermaid.ink again
+    if not _SVG_RE.match(svg):
+        raise _NotRendered(graph)
+    _write_cache(cache_path, svg)
+    return svg
+
+
+def _write_cache(cache_path: str, svg: str):
+    # Written to a temporary file and renamed into place, so that a crash or a concurrent run never leaves a
+    #  truncated file behind to be read back as a cache hit
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=CACHE_DIR, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            f.write(svg)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logger.debug("Could not cache rendered SVG at %s", cache_path, exc_info=True)
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def fetch_svg(graph: str) -> str:
     graph_bytes = graph.encode("ascii")
     base64_bytes = base64.b64encode(graph_bytes)
     base64_string = base64_bytes.decode("ascii")
@@ -15,7 +85,7 @@ def mermaid_to_svg(graph: str) -> str:
     e = None
     for timeout in range(2, 9, 2):
         try:
-            result = requests.get(uri, timeout=timeout)
+            result = _SESSION.get(uri, timeout=timeout)
             break
         except requests.exceptions.Timeout as e:
             continue
@@ -25,8 +95,11 @@ def mermaid_to_svg(graph: str) -> str:
         else:
             raise Exception("Cosmic rays")
 
+    if not result.ok:
+        logger.warning("mermaid.ink could not render the graph: HTTP %s %s", result.status_code, result.reason)
+        return ""
     if result.text == "invalid encoded code":
-        print(result.text)
+        logger.warning("mermaid.ink could not render the graph: %s", result.text)
         return ""
     return result.text
 
@@ -38,6 +111,9 @@ def svg_to_excalidraw(svg: str) -> str:
 
 
 if __name__ == "__main__":
+    # The converters' debug output is what fills the DEBUG section below
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+
     graph = """
     graph
         U1(User 1) -- Message --> W1[Webserver 1]
@@ -140,11 +216,13 @@ flowchart TB
 """
 
     svg = mermaid_to_svg(graph)
-    tree = BeautifulSoup(svg, "html.parser")
+    # Parsed as HTML (like Excalidraw.from_svg does) since mermaid's labels aren't always well-formed XML
+    tree = etree.fromstring(svg.encode(), etree.HTMLParser(remove_blank_text=True, encoding="utf-8"))
+    pretty_svg = etree.tostring(tree.find(".//svg"), pretty_print=True, encoding=str)
     with open("example_svg.svg", "w") as f:
-        f.write(tree.prettify())
+        f.write(pretty_svg)
     print("SVG:")
-    print(tree.prettify())
+    print(pretty_svg)
     print("\nDEBUG:")
     excali = svg_to_excalidraw(svg)
     raw = json.dumps(excali, indent=2)